@@ -0,0 +1,29 @@
+# Flight parameters
+TURN_START_ALTITUDE = 1000  # Altitude to start gravity turn (m)
+TURN_END_ALTITUDE = 45000  # Altitude to complete gravity turn (m)
+
+
+def ascent_guidance(vessel, altitude, srb_fuel, srb_separated):
+    """
+    Perform one step of the ascent guidance: gravity turn and SRB separation.
+
+    Works with a live kRPC connection as well as with a replay (see replay.py).
+
+    :param vessel: Active vessel
+    :param altitude: Stream of the mean altitude (m)
+    :param srb_fuel: Stream of the solid fuel left in the SRBs
+    :param srb_separated: Whether the SRBs have already been separated
+    :return: Updated SRB separation flag
+    """
+    # Gravity turn logic
+    if TURN_START_ALTITUDE < altitude() < TURN_END_ALTITUDE:
+        frac = (altitude() - TURN_START_ALTITUDE) / (TURN_END_ALTITUDE - TURN_START_ALTITUDE)
+        vessel.auto_pilot.target_pitch_and_heading(90 - frac * 90, 90)
+
+    # Separate SRBs when fuel is depleted
+    if not srb_separated and srb_fuel() <= 0:
+        print("Separating SRBs.")
+        vessel.control.activate_next_stage()
+        srb_separated = True
+
+    return srb_separated
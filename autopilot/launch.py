@@ -2,8 +2,13 @@ import krpc
 import time
 import math
 import json
+import sys
 import os
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "model_comparison"))
+from recordings_catalog import register_recording
+from guidance import ascent_guidance
+
 # Time for recording flight data (seconds)
 RECORD_TIME = 140
 
@@ -30,8 +35,6 @@ def save_flight_data():
         json.dump(flight_data, file, indent=4)
 
 # Flight parameters
-TURN_START_ALTITUDE = 1000  # Altitude to start gravity turn (m)
-TURN_END_ALTITUDE = 45000  # Altitude to complete gravity turn (m)
 TARGET_APOAPSIS = 100000   # Target apoapsis altitude (m)
 
 # Connect to Kerbal Space Program (KSP)
@@ -72,37 +75,38 @@ current_time = ut() - start_time
 is_data_saved = False  # Flag to ensure data is saved only once
 
 # Main ascent loop
-while apoapsis() < TARGET_APOAPSIS:
-    # Record data during the ascent phase
-    if current_time <= RECORD_TIME:
-        current_time = ut() - start_time
-        speed_records.append(speed())
-        altitude_records.append(altitude())
-        angle_records.append(90 - angle())
-        mass_records.append(mass())
-        time_records.append(current_time)
-    else:
-        if not is_data_saved:
-            save_flight_data()
-            is_data_saved = True
-            print("Flight data has been saved.")
-
-    # Gravity turn logic
-    if TURN_START_ALTITUDE < altitude() < TURN_END_ALTITUDE:
-        frac = (altitude() - TURN_START_ALTITUDE) / (TURN_END_ALTITUDE - TURN_START_ALTITUDE)
-        vessel.auto_pilot.target_pitch_and_heading(90 - frac * 90, 90)
-
-    # Separate SRBs when fuel is depleted
-    if not srb_separated and srb_fuel() <= 0:
-        print("Separating SRBs.")
-        vessel.control.activate_next_stage()
-        srb_separated = True
-
-    time.sleep(0.1)
+try:
+    while apoapsis() < TARGET_APOAPSIS:
+        # Record data during the ascent phase
+        if current_time <= RECORD_TIME:
+            current_time = ut() - start_time
+            speed_records.append(speed())
+            altitude_records.append(altitude())
+            angle_records.append(90 - angle())
+            mass_records.append(mass())
+            time_records.append(current_time)
+        else:
+            if not is_data_saved:
+                save_flight_data()
+                is_data_saved = True
+                print("Flight data has been saved.")
+
+        # Gravity turn and SRB separation
+        srb_separated = ascent_guidance(vessel, altitude, srb_fuel, srb_separated)
+
+        time.sleep(0.1)
+
+    # Cut off engines and prepare for orbit circularization
+    vessel.control.activate_next_stage()
+    vessel.control.throttle = 0
+finally:
+    # Guidance no longer runs here; register even if the ascent was aborted
+    if is_data_saved:
+        try:
+            register_recording("records/flight_data.json", "flight")
+        except Exception as error:
+            print(f"Could not update the recordings catalog: {error}")
 
-# Cut off engines and prepare for orbit circularization
-vessel.control.activate_next_stage()
-vessel.control.throttle = 0
 print("Reached target apoapsis. Preparing for circularization maneuver.")
 
 # Planning the circularization maneuver
@@ -146,3 +150,4 @@ vessel.control.throttle = 0
 vessel.control.remove_nodes()
 vessel.control.activate_next_stage()
 print("Circularization complete. Stable orbit achieved.")
+
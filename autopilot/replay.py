@@ -0,0 +1,284 @@
+import argparse
+import bisect
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "model_comparison"))
+from recordings_catalog import staging_events
+from guidance import ascent_guidance
+
+
+class ReplayStream:
+    """
+    Callable stream with the interface of `krpc` streams, evaluated against the replay clock.
+    """
+
+    def __init__(self, function, args, kwargs):
+        self._function = function
+        self._args = args
+        self._kwargs = kwargs
+
+    def __call__(self):
+        return self._function(*self._args, **self._kwargs)
+
+    def start(self):
+        pass
+
+    def remove(self):
+        pass
+
+
+class _Flight:
+    """
+    Recorded flight parameters of the vessel.
+    """
+
+    def __init__(self, replay):
+        self._replay = replay
+
+    @property
+    def mean_altitude(self):
+        return self._replay.value("altitude")
+
+    @property
+    def speed(self):
+        return self._replay.value("speed")
+
+    @property
+    def pitch(self):
+        # Flight records store the angle from vertical (90 - pitch)
+        return 90 - self._replay.value("angle")
+
+
+class _Resources:
+    """
+    Solid fuel of the boosters, reconstructed from the recorded SRB separation.
+
+    Fuel runs out exactly when the recorded mass drops, so staging driven by this resource
+    reproduces the recorded separation and cannot reveal a staging regression of the guidance.
+    """
+
+    def __init__(self, replay):
+        self._replay = replay
+
+    def amount(self, name):
+        if name != "SolidFuel":
+            raise AttributeError(f"Resource {name!r} is not available in a replay")
+        separation = self._replay.srb_separation_time
+        return 0.0 if separation is not None and self._replay.time >= separation else 1.0
+
+
+class _AutoPilot:
+    """
+    Autopilot that records the commanded pitch and heading instead of steering.
+    """
+
+    def __init__(self, replay):
+        self._replay = replay
+        self.commands = []  # (ut, pitch, heading)
+
+    def engage(self):
+        pass
+
+    def disengage(self):
+        pass
+
+    def target_pitch_and_heading(self, pitch, heading):
+        self.commands.append((self._replay.ut, pitch, heading))
+
+
+class _Control:
+    """
+    Vessel controls that record staging instead of acting on the vessel.
+    """
+
+    def __init__(self, replay):
+        self._replay = replay
+        self.staging = []  # ut of every activate_next_stage call
+        self.throttle = 0.0
+        self.sas = False
+        self.sas_mode = None
+        self.rcs = False
+
+    def activate_next_stage(self):
+        self.staging.append(self._replay.ut)
+        return []
+
+    def add_node(self, *args, **kwargs):
+        pass
+
+    def remove_nodes(self):
+        pass
+
+
+class _Body:
+    reference_frame = "body"
+
+
+class _Orbit:
+    body = _Body()
+
+
+class _Vessel:
+    """
+    Active vessel of a replay; only recorded quantities are available.
+
+    Orbital elements such as `orbit.apoapsis_altitude` are not recorded, so loops conditioned
+    on them must be driven by `ReplayConnection.samples()` instead.
+    """
+
+    surface_reference_frame = "surface"
+    orbit = _Orbit()
+
+    def __init__(self, replay):
+        self._replay = replay
+        self._flight = _Flight(replay)
+        self._resources = _Resources(replay)
+        self.auto_pilot = _AutoPilot(replay)
+        self.control = _Control(replay)
+
+    @property
+    def mass(self):
+        return self._replay.value("mass")
+
+    def flight(self, reference_frame=None):
+        return self._flight
+
+    def resources_in_decouple_stage(self, stage, cumulative=True):
+        return self._resources
+
+
+class _SpaceCenter:
+    def __init__(self, replay):
+        self._replay = replay
+        self.active_vessel = _Vessel(replay)
+
+    @property
+    def ut(self):
+        return self._replay.ut
+
+
+class ReplayConnection:
+    """
+    Play back a recorded flight through the `conn.add_stream` interface of the autopilot scripts.
+
+    With `speedup` set, the replay clock follows the wall clock `speedup` times faster, so polling
+    loops work unchanged. Without it the replay runs as fast as possible and advances one recorded
+    sample at a time through `samples()`. Stream values are held at the last sample reached, and
+    `ut` always equals `start_ut` plus the recorded time stamp of that sample.
+    """
+
+    def __init__(self, path, speedup=None, start_ut=0.0):
+        with open(path, "r") as file:
+            self._data = json.load(file)
+        self._times = self._data["time"]
+        if not self._times:
+            raise ValueError(f"Recording {path} contains no samples")
+        if speedup is not None and speedup <= 0:
+            raise ValueError(f"Replay speedup must be positive, got {speedup}")
+        self._speedup = speedup
+        self._start_ut = start_ut
+        self._index = 0
+        self._wall_start = None
+
+        events = staging_events(self._data)
+        self.srb_separation_time = events[0][0] if events else None
+        self.space_center = _SpaceCenter(self)
+
+    def add_stream(self, function, *args, **kwargs):
+        """
+        Create a stream, e.g. `conn.add_stream(getattr, vessel.flight(), "mean_altitude")`.
+        """
+        return ReplayStream(function, args, kwargs)
+
+    def start(self):
+        """
+        Start the wall clock of a paced replay; called implicitly by the first read.
+        """
+        self._wall_start = time.perf_counter()
+
+    def _current_index(self):
+        if self._speedup is None:
+            return self._index
+        if self._wall_start is None:
+            self.start()
+        replay_time = self._times[0] + (time.perf_counter() - self._wall_start) * self._speedup
+        self._index = max(bisect.bisect_right(self._times, replay_time) - 1, 0)
+        return self._index
+
+    @property
+    def time(self):
+        """
+        Recorded time stamp of the current sample (s).
+        """
+        return self._times[self._current_index()]
+
+    @property
+    def ut(self):
+        return self._start_ut + self.time
+
+    @property
+    def finished(self):
+        return self._current_index() == len(self._times) - 1
+
+    def value(self, channel):
+        """
+        Value of a recorded channel at the current sample.
+        """
+        return self._data[channel][self._current_index()]
+
+    def samples(self):
+        """
+        Step through every recorded sample, yielding its ut; paced replays sleep between samples.
+        """
+        if self._speedup is not None:
+            self.start()
+        for index, sample_time in enumerate(self._times):
+            if self._speedup is not None:
+                delay = (sample_time - self._times[0]) / self._speedup - (time.perf_counter() - self._wall_start)
+                if delay > 0:
+                    time.sleep(delay)
+                if self._current_index() > index:
+                    continue  # Samples already passed by the wall clock
+            self._index = index
+            yield self._start_ut + sample_time
+
+    def close(self):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded flight through the ascent guidance of launch.py.")
+    parser.add_argument("path", nargs="?", default="records/flight_data.json", help="Recorded flight")
+    parser.add_argument("--speedup", type=float, help="Replay speed factor (default: as fast as possible)")
+    args = parser.parse_args()
+
+    conn = ReplayConnection(args.path, speedup=args.speedup)
+    vessel = conn.space_center.active_vessel
+    ut = conn.add_stream(getattr, conn.space_center, "ut")
+    altitude = conn.add_stream(getattr, vessel.flight(), "mean_altitude")
+    angle = conn.add_stream(getattr, vessel.flight(vessel.surface_reference_frame), "pitch")
+    srb_fuel = conn.add_stream(vessel.resources_in_decouple_stage(9, cumulative=False).amount, "SolidFuel")
+
+    wall_start = time.perf_counter()
+    srb_separated = False
+    pitch_errors = []
+    for _ in conn.samples():
+        commands = len(vessel.auto_pilot.commands)
+        srb_separated = ascent_guidance(vessel, altitude, srb_fuel, srb_separated)
+        if len(vessel.auto_pilot.commands) > commands:
+            pitch_errors.append(abs(vessel.auto_pilot.commands[-1][1] - angle()))
+    wall_time = time.perf_counter() - wall_start
+
+    print(f"Replayed {ut():.2f} s of flight in {wall_time:.3f} s.")
+    print(f"Staging commands at ut: {', '.join(f'{t:.2f}' for t in vessel.control.staging) or 'none'} "
+          f"(SRB fuel follows the recorded separation, so staging only echoes the recording).")
+    if pitch_errors:
+        print(f"{len(pitch_errors)} pitch commands, mean deviation from the recorded pitch "
+              f"{sum(pitch_errors) / len(pitch_errors):.2f}°, max {max(pitch_errors):.2f}°.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import numpy as np
+import hashlib
+import json
+
+# Lookup table parameters
+TABLE_STEP = 10  # Altitude step of the lookup tables (m)
+TABLE_TOP_ALTITUDE = 250_000  # Highest tabulated altitude (m)
+_INVERSE_STEP = 1 / TABLE_STEP
+TABLE_FORMAT_VERSION = 1  # Bump whenever build_tables changes the tabulated values
+
+# Celestial body parameters
+BODIES = {
+    "Kerbin": {
+        "radius": 600_000,  # Radius of the planet (m)
+        "surface_gravity": 9.82,  # Gravitational acceleration at sea level (m/s^2)
+        "surface_pressure": 101_325,  # Atmospheric pressure at sea level (Pa)
+        "surface_density": 1.225,  # Air density at sea level (kg/m^3)
+        "scale_height": 5600,  # Atmospheric scale height (m)
+        "atmosphere_depth": 70_000,  # Altitude of the upper edge of the atmosphere (m)
+        # Temperature curve as (altitude (m), temperature (K)) keys.
+        # Kept isothermal so the density matches the calibrated ascent model.
+        "temperature_keys": [(0, 288.15)],
+    },
+    "Duna": {
+        "radius": 320_000,
+        "surface_gravity": 2.94,
+        "surface_pressure": 6_750,
+        "surface_density": 0.1533,
+        "scale_height": 5_700,
+        "atmosphere_depth": 50_000,
+        "temperature_keys": [(0, 233.0), (10_000, 215.0), (25_000, 190.0), (50_000, 175.0)],
+    },
+}
+
+
+class BodyModel:
+    """
+    Precomputed density, pressure and gravity of a celestial body.
+
+    Lookups accept scalars as well as (N,) arrays of altitudes and interpolate
+    linearly between the table nodes.
+    """
+
+    def __init__(self, name, parameters, altitudes, density, pressure, gravity):
+        self.name = name
+        self.radius = parameters["radius"]
+        self.surface_gravity = parameters["surface_gravity"]
+        self.atmosphere_depth = parameters["atmosphere_depth"]
+        self.altitudes = altitudes
+        self.density_table = density
+        self.pressure_table = pressure
+        self.gravity_table = gravity
+        # Plain lists are much faster than arrays for scalar indexing inside the ODE right-hand side
+        self._density_list = density.tolist()
+        self._pressure_list = pressure.tolist()
+        self._gravity_list = gravity.tolist()
+        self._last_index = len(altitudes) - 1
+
+    def _interpolate(self, table, altitude, above):
+        """
+        Interpolate a table at an array of altitudes, using `above(altitude)` past the table top.
+        """
+        altitudes = np.atleast_1d(altitude)
+        result = np.interp(altitudes, self.altitudes, table)
+        outside = altitudes > self.altitudes[-1]
+        if outside.any():
+            result[outside] = above(altitudes[outside])
+        return result.reshape(np.shape(altitude))
+
+    def _lookup(self, values, altitude):
+        """
+        Interpolate a table at a scalar altitude, returning None past the table top.
+        """
+        # Pure float arithmetic: numpy scalar operations cost several times more
+        position = float(altitude) * _INVERSE_STEP
+        if position <= 0:
+            return values[0]
+        index = int(position)
+        if index >= self._last_index:
+            return None if position > self._last_index else values[-1]
+        lower = values[index]
+        return lower + (values[index + 1] - lower) * (position - index)
+
+    def _slope(self, values, altitude):
+        """
+        Derivative over altitude of the interpolated table at a scalar altitude, None past the table top.
+        """
+        position = float(altitude) * _INVERSE_STEP
+        if position < 0:
+            return 0.0
+        index = int(position)
+        if index >= self._last_index:
+            return None
+        return (values[index + 1] - values[index]) * _INVERSE_STEP
+
+    def density(self, altitude):
+        """
+        Air density (kg/m^3) at the given altitude.
+        """
+        if isinstance(altitude, np.ndarray):
+            return self._interpolate(self.density_table, altitude, _zero)
+        value = self._lookup(self._density_list, altitude)
+        return 0.0 if value is None else value
+
+    def density_slope(self, altitude):
+        """
+        Derivative of the interpolated air density over altitude (kg/m^4) at a scalar altitude.
+        """
+        value = self._slope(self._density_list, altitude)
+        return 0.0 if value is None else value
+
+    def pressure(self, altitude):
+        """
+        Atmospheric pressure (Pa) at the given altitude.
+        """
+        if isinstance(altitude, np.ndarray):
+            return self._interpolate(self.pressure_table, altitude, _zero)
+        value = self._lookup(self._pressure_list, altitude)
+        return 0.0 if value is None else value
+
+    def gravity(self, altitude):
+        """
+        Gravitational acceleration (m/s^2) at the given altitude.
+        """
+        if isinstance(altitude, np.ndarray):
+            return self._interpolate(self.gravity_table, altitude, self.exact_gravity)
+        value = self._lookup(self._gravity_list, altitude)
+        return self.exact_gravity(altitude) if value is None else value
+
+    def gravity_slope(self, altitude):
+        """
+        Derivative of the interpolated gravitational acceleration over altitude (1/s^2) at a scalar altitude.
+        """
+        value = self._slope(self._gravity_list, altitude)
+        return -2 * self.exact_gravity(altitude) / (self.radius + altitude) if value is None else value
+
+    def exact_gravity(self, altitude):
+        """
+        Gravitational acceleration (m/s^2) computed from the inverse-square law.
+        """
+        return self.surface_gravity * self.radius ** 2 / (self.radius + altitude) ** 2
+
+
+def _zero(altitude):
+    """
+    Value of atmospheric quantities above the tabulated range.
+    """
+    return altitude * 0.0
+
+
+def build_tables(parameters):
+    """
+    Compute altitude, density, pressure and gravity tables of a body.
+    """
+    altitudes = np.arange(0, TABLE_TOP_ALTITUDE + TABLE_STEP, TABLE_STEP, dtype=float)
+    in_atmosphere = altitudes <= parameters["atmosphere_depth"]
+
+    key_altitudes, key_temperatures = zip(*parameters["temperature_keys"])
+    temperature = np.interp(altitudes, key_altitudes, key_temperatures)
+
+    # Exponential pressure profile; density follows the ideal gas law with the temperature curve
+    falloff = np.exp(-altitudes / parameters["scale_height"])
+    pressure = np.where(in_atmosphere, parameters["surface_pressure"] * falloff, 0.0)
+    density = np.where(
+        in_atmosphere,
+        parameters["surface_density"] * falloff * key_temperatures[0] / temperature,
+        0.0,
+    )
+
+    radius = parameters["radius"]
+    gravity = parameters["surface_gravity"] * radius ** 2 / (radius + altitudes) ** 2
+    return altitudes, density, pressure, gravity
+
+
+def table_key(name):
+    """
+    Digest of everything the tables of a body depend on, for artifacts derived from them.
+    """
+    key = json.dumps([BODIES[name], TABLE_STEP, TABLE_TOP_ALTITUDE, TABLE_FORMAT_VERSION], sort_keys=True)
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+_loaded_models = {}
+
+
+def get_body_model(name):
+    """
+    Return the tabulated model of a body, building its tables on first use.
+
+    Building takes under a millisecond, so the tables are only kept for the lifetime of the process.
+    """
+    if name in _loaded_models:
+        return _loaded_models[name]
+    if name not in BODIES:
+        raise KeyError(f"Unknown body {name!r}, expected one of: {', '.join(BODIES)}")
+
+    parameters = BODIES[name]
+    model = BodyModel(name, parameters, *build_tables(parameters))
+    _loaded_models[name] = model
+    return model
@@ -0,0 +1,74 @@
+import numpy as np
+
+MAX_PLOT_POINTS = 2_000  # Maximum number of points drawn per series
+
+
+def lttb(x, y, max_points):
+    """
+    Reduce a series with the Largest-Triangle-Three-Buckets algorithm.
+
+    The first and last points are always kept; every bucket in between keeps the point
+    forming the largest triangle with the previously selected point and the next bucket's mean.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if max_points >= len(x) or max_points < 3:
+        return x, y
+
+    # Bucket boundaries for all points except the first and the last one
+    edges = np.linspace(1, len(x) - 1, max_points - 1).astype(int)
+    selected = np.empty(max_points, dtype=int)
+    selected[0] = 0
+    selected[-1] = len(x) - 1
+
+    previous = 0
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_start, next_end = end, edges[bucket + 2] if bucket + 2 < len(edges) else len(x)
+        mean_x = x[next_start:next_end].mean()
+        mean_y = y[next_start:next_end].mean()
+
+        areas = np.abs(
+            (x[previous] - mean_x) * (y[start:end] - y[previous]) -
+            (x[previous] - x[start:end]) * (mean_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+
+    return x[selected], y[selected]
+
+
+def min_max(x, y, max_points):
+    """
+    Reduce a series keeping the minimum and maximum of every bucket.
+
+    Guarantees that global extremes (e.g. peak errors) survive the reduction.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if max_points >= len(x) or max_points < 4:
+        return x, y
+
+    edges = np.linspace(0, len(x), max_points // 2 + 1).astype(int)
+    selected = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        if start == end:
+            continue
+        bucket = y[start:end]
+        low, high = start + int(np.argmin(bucket)), start + int(np.argmax(bucket))
+        selected.extend(sorted({low, high}))
+
+    return x[selected], y[selected]
+
+
+def downsample(x, y, max_points=MAX_PLOT_POINTS, method="lttb"):
+    """
+    Reduce a series to at most `max_points` points for plotting.
+
+    :param method: "lttb" for Largest-Triangle-Three-Buckets, "minmax" for per-bucket extremes
+    """
+    if method == "lttb":
+        return lttb(x, y, max_points)
+    if method == "minmax":
+        return min_max(x, y, max_points)
+    raise ValueError(f"Unknown downsampling method {method!r}, expected 'lttb' or 'minmax'")
@@ -1,9 +1,12 @@
-from scipy import integrate
 import numpy as np
+import argparse
 import math
 import json
 import os
 
+from body_models import BODIES, get_body_model
+from recordings_catalog import register_recording
+
 SIMULATE_TIME = 140
 
 # Constants
@@ -25,142 +28,262 @@ STAGE2_ENGINE_COUNT = 2  # Number of engines in the second stage
 STAGE2_ISP = 315  # Specific impulse of second stage engines (s)
 STAGE2_BURN_TIME = 116.94  # Burn time of the second stage (s)
 
+# Aerodynamics
+DRAG_COEFFICIENT = 1.5  # Drag coefficient
+REFERENCE_AREA = 18  # Reference cross-sectional area (m^2)
+SCALE_HEIGHT = BODIES["Kerbin"]["scale_height"]  # Atmospheric scale height of the Kerbin tables (m)
+
+# Gravity turn
+TURN_START_ALTITUDE = 1_000  # Altitude to start gravity turn (m)
+TURN_END_ALTITUDE = 45_000  # Altitude to complete gravity turn (m)
+
+# Initial conditions
+INITIAL_VERTICAL_VELOCITY = 0  # Vertical velocity (m/s)
+INITIAL_ALTITUDE = 0  # Altitude (m)
+INITIAL_HORIZONTAL_VELOCITY = 0  # Horizontal velocity (m/s)
+SIMULATION_POINTS = 1250  # Number of points of the output time grid
+
+# Model parameters, in the order of parameter vectors and sensitivity matrices
+PARAMETER_NAMES = (
+    "srb_thrust",  # Thrust of one SRB (N)
+    "stage2_thrust",  # Thrust of one second stage engine (N)
+    "srb_isp",  # Specific impulse of SRBs (s)
+    "stage2_isp",  # Specific impulse of second stage engines (s)
+    "initial_mass",  # Initial mass of the rocket (kg)
+    "stage1_mass",  # Mass after booster separation (kg)
+    "drag_coefficient",  # Drag coefficient
+    "scale_height",  # Atmospheric scale height (m)
+)
+(SRB_THRUST_INDEX, STAGE2_THRUST_INDEX, SRB_ISP_INDEX, STAGE2_ISP_INDEX,
+ INITIAL_MASS_INDEX, STAGE1_MASS_INDEX, DRAG_COEFFICIENT_INDEX, SCALE_HEIGHT_INDEX) = range(len(PARAMETER_NAMES))
+NOMINAL_PARAMETERS = (
+    SRB_THRUST, STAGE2_THRUST, SRB_ISP, STAGE2_ISP, INITIAL_MASS, STAGE1_MASS, DRAG_COEFFICIENT, SCALE_HEIGHT,
+)
 
-def write_values():
+
+def nominal_parameters():
+    """
+    Nominal model parameters keyed by name.
+    """
+    return dict(zip(PARAMETER_NAMES, NOMINAL_PARAMETERS))
+
+
+def parameter_vector(parameters=None):
+    """
+    Parameter vector in PARAMETER_NAMES order.
+
+    :param parameters: None for the nominal values, a dictionary of overrides or a sequence of all values
+    """
+    if parameters is None:
+        return NOMINAL_PARAMETERS
+    if isinstance(parameters, dict):
+        unknown = set(parameters) - set(PARAMETER_NAMES)
+        if unknown:
+            raise KeyError(f"Unknown parameters: {', '.join(sorted(unknown))}")
+        return tuple(float(parameters.get(name, value)) for name, value in zip(PARAMETER_NAMES, NOMINAL_PARAMETERS))
+    # Plain floats keep the arithmetic in the right-hand side fast
+    vector = tuple(float(value) for value in parameters)
+    if len(vector) != len(PARAMETER_NAMES):
+        raise ValueError(f"Expected {len(PARAMETER_NAMES)} parameters, got {len(vector)}")
+    return vector
+
+
+def write_values(result, path="records/model_data.json", flight_path=None):
     """
     Write simulation results to a JSON file for analysis.
     """
-    os.makedirs("records", exist_ok=True)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
     flight_data = {
-        "speed": total_speed.tolist(),
-        "altitude": altitude.tolist(),
-        "angle": [math.degrees(alpha(h)) for h in altitude],
-        "mass": [mass_at_time(t) for t in time],
-        "time": time.tolist(),
+        "speed": result["speed"].tolist(),
+        "altitude": result["altitude"].tolist(),
+        "angle": [math.degrees(alpha(h)) for h in result["altitude"]],
+        "mass": result["mass"].tolist(),
+        "time": result["time"].tolist(),
     }
-    with open("records/model_data.json", "w") as file:
+    with open(path, "w") as file:
         json.dump(flight_data, file, indent=4)
+    register_recording(path, "model", flight_data, counterpart=flight_path)
 
 
-def alpha(altitude):
+def alpha(altitude, partials=False):
     """
     Compute the pitch angle of the rocket based on altitude.
+
+    With `partials`, also return its derivative over altitude.
     """
     max_turn_angle = math.radians(90)  # Maximum angle (90 degrees)
-    turn_start_altitude = 1_000  # Altitude to start gravity turn (m)
-    turn_end_altitude = 45_000  # Altitude to complete gravity turn (m)
-
-    if altitude < turn_start_altitude:
-        return 0
-    elif turn_start_altitude <= altitude <= turn_end_altitude:
-        progress = (altitude - turn_start_altitude) / (turn_end_altitude - turn_start_altitude)
-        return math.radians(90 * progress)
+    turn_rate = max_turn_angle / (TURN_END_ALTITUDE - TURN_START_ALTITUDE)
+
+    if altitude < TURN_START_ALTITUDE:
+        angle, derivative = 0, 0.0
+    elif TURN_START_ALTITUDE <= altitude <= TURN_END_ALTITUDE:
+        angle, derivative = (altitude - TURN_START_ALTITUDE) * turn_rate, turn_rate
     else:
-        return max_turn_angle
+        angle, derivative = max_turn_angle, 0.0
+    return (angle, derivative) if partials else angle
 
 
-def effective_isp(time):
+def propulsion(time, p=NOMINAL_PARAMETERS, partials=False):
     """
-    Calculate the effective specific impulse of the rocket at a given time.
+    Calculate the thrust (N), mass (kg) and propellant mass flow (kg/s) of the rocket at a given time.
+
+    The mass flow of every engine is its thrust / (ISP * g0). With `partials`, the gradients of
+    thrust and mass over the parameters are returned as well.
     """
+    srb_thrust, stage2_thrust, srb_isp, stage2_isp, initial_mass, stage1_mass = p[:STAGE1_MASS_INDEX + 1]
+    srb_flow = SRB_COUNT * srb_thrust / (srb_isp * GRAVITY_KERBIN)
+    stage2_flow = STAGE2_ENGINE_COUNT * stage2_thrust / (stage2_isp * GRAVITY_KERBIN)
+
+    if time < SRB_BURN_TIME:
+        thrust = SRB_COUNT * srb_thrust + STAGE2_ENGINE_COUNT * stage2_thrust
+        flow = srb_flow + stage2_flow
+        burn_time = time
+        mass = initial_mass - flow * burn_time
+    else:
+        thrust = STAGE2_ENGINE_COUNT * stage2_thrust
+        flow = stage2_flow
+        burn_time = time - SRB_BURN_TIME
+        mass = stage1_mass - flow * burn_time
+    if not partials:
+        return thrust, mass, flow
+
+    thrust_gradient = np.zeros(len(PARAMETER_NAMES))
+    mass_gradient = np.zeros(len(PARAMETER_NAMES))
+    thrust_gradient[STAGE2_THRUST_INDEX] = STAGE2_ENGINE_COUNT
+    mass_gradient[STAGE2_THRUST_INDEX] = -stage2_flow / stage2_thrust * burn_time
+    mass_gradient[STAGE2_ISP_INDEX] = stage2_flow / stage2_isp * burn_time
     if time < SRB_BURN_TIME:
-        return (
-            (SRB_THRUST * SRB_COUNT + STAGE2_THRUST * STAGE2_ENGINE_COUNT) /
-            (SRB_THRUST * SRB_COUNT / SRB_ISP + STAGE2_THRUST * STAGE2_ENGINE_COUNT / STAGE2_ISP) *
-            GRAVITY_KERBIN
-        )
+        thrust_gradient[SRB_THRUST_INDEX] = SRB_COUNT
+        mass_gradient[SRB_THRUST_INDEX] = -srb_flow / srb_thrust * burn_time
+        mass_gradient[SRB_ISP_INDEX] = srb_flow / srb_isp * burn_time
+        mass_gradient[INITIAL_MASS_INDEX] = 1.0
     else:
-        return (
-            (STAGE2_THRUST * STAGE2_ENGINE_COUNT) /
-            (STAGE2_THRUST * STAGE2_ENGINE_COUNT / STAGE2_ISP) *
-            GRAVITY_KERBIN
-        )
+        mass_gradient[STAGE1_MASS_INDEX] = 1.0
+    return thrust, mass, flow, thrust_gradient, mass_gradient
 
 
-def mass_at_time(time):
+def effective_isp(time, p=NOMINAL_PARAMETERS):
+    """
+    Calculate the effective exhaust velocity (specific impulse * g0) of the rocket at a given time.
+    """
+    thrust, _, flow = propulsion(time, p)
+    return thrust / flow
+
+
+def mass_at_time(time, p=NOMINAL_PARAMETERS):
     """
     Calculate the mass of the rocket at a given time.
     """
-    if time < SRB_BURN_TIME:
-        return INITIAL_MASS - (SRB_THRUST * SRB_COUNT + STAGE2_THRUST * STAGE2_ENGINE_COUNT) / effective_isp(time) * time
-    else:
-        return STAGE1_MASS - (STAGE2_THRUST * STAGE2_ENGINE_COUNT) / effective_isp(time) * (time - SRB_BURN_TIME)
+    return propulsion(time, p)[1]
 
 
-def thrust_at_time(time):
+def thrust_at_time(time, p=NOMINAL_PARAMETERS):
     """
     Calculate the thrust of the rocket at a given time.
     """
-    if time < SRB_BURN_TIME:
-        return SRB_THRUST * SRB_COUNT + STAGE2_THRUST * STAGE2_ENGINE_COUNT
-    else:
-        return STAGE2_THRUST * STAGE2_ENGINE_COUNT
+    return propulsion(time, p)[0]
 
 
-def gravity_at_altitude(altitude):
+def gravity_at_altitude(altitude, partials=False):
     """
     Calculate the gravitational acceleration at a given altitude.
+
+    With `partials`, also return its derivative over altitude.
     """
-    planet_radius = 600_000  # Radius of Kerbin (m)
-    return GRAVITY_KERBIN * (planet_radius ** 2) / (planet_radius + altitude) ** 2
+    kerbin = get_body_model("Kerbin")
+    gravity = kerbin.gravity(altitude)
+    return (gravity, kerbin.gravity_slope(altitude)) if partials else gravity
 
 
-def drag_force(velocity, altitude):
+def drag_force(velocity, altitude, p=NOMINAL_PARAMETERS, partials=False):
     """
     Calculate the aerodynamic drag on the rocket.
+
+    A scale height other than SCALE_HEIGHT stretches the tabulated atmosphere vertically.
+    With `partials`, also return the derivatives over velocity and altitude and the gradient
+    over the parameters.
     """
-    air_density_at_sea_level = 1.225  # Air density at sea level (kg/m^3)
-    scale_height = 5600  # Atmospheric scale height (m)
-    drag_coefficient = 1.5  # Drag coefficient
-    reference_area = 18  # Reference cross-sectional area (m^2)
+    drag_coefficient, scale_height = p[DRAG_COEFFICIENT_INDEX], p[SCALE_HEIGHT_INDEX]
+    kerbin = get_body_model("Kerbin")
+    stretch = SCALE_HEIGHT / scale_height
+    scaled_altitude = altitude * stretch
 
-    air_density = air_density_at_sea_level * np.exp(-altitude / scale_height)
-    return 0.5 * drag_coefficient * air_density * velocity ** 2 * reference_area
+    air_density = kerbin.density(scaled_altitude)
+    dynamic_pressure_area = 0.5 * velocity ** 2 * REFERENCE_AREA
+    force = drag_coefficient * air_density * dynamic_pressure_area
+    if not partials:
+        return force
+
+    density_slope = kerbin.density_slope(scaled_altitude)
+    velocity_derivative = drag_coefficient * air_density * velocity * REFERENCE_AREA
+    altitude_derivative = drag_coefficient * density_slope * stretch * dynamic_pressure_area
+    parameter_gradient = np.zeros(len(PARAMETER_NAMES))
+    parameter_gradient[DRAG_COEFFICIENT_INDEX] = air_density * dynamic_pressure_area
+    parameter_gradient[SCALE_HEIGHT_INDEX] = (
+        -drag_coefficient * density_slope * scaled_altitude / scale_height * dynamic_pressure_area
+    )
+    return force, velocity_derivative, altitude_derivative, parameter_gradient
 
 
-def system_equations(time, state):
+def system_equations(time, state, p=NOMINAL_PARAMETERS):
     """
     Define the system of equations for the rocket's motion.
     """
-    vertical_velocity, altitude, horizontal_velocity = state
+    vertical_velocity, altitude, horizontal_velocity = np.asarray(state).tolist()
+    thrust, mass, _ = propulsion(time, p)
+    angle = alpha(altitude)
 
     dv_dt = (
-        (thrust_at_time(time) * np.cos(alpha(altitude)) - drag_force(vertical_velocity, altitude)) /
-        mass_at_time(time) -
+        (thrust * math.cos(angle) - drag_force(vertical_velocity, altitude, p)) / mass -
         gravity_at_altitude(altitude)
     )
     dh_dt = vertical_velocity
-    du_dt = (
-        (thrust_at_time(time) * np.sin(alpha(altitude)) - drag_force(horizontal_velocity, altitude)) /
-        mass_at_time(time)
-    )
+    du_dt = (thrust * math.sin(angle) - drag_force(horizontal_velocity, altitude, p)) / mass
 
     return [dv_dt, dh_dt, du_dt]
 
 
-# Initial conditions
-initial_vertical_velocity = 0  # Vertical velocity (m/s)
-initial_altitude = 0  # Altitude (m)
-initial_horizontal_velocity = 0  # Horizontal velocity (m/s)
-
-# Time simulation range
-simulation_time = np.linspace(0, SIMULATE_TIME, 1250)
-
-# Solve the system of differential equations
-solution = integrate.solve_ivp(
-    system_equations,
-    t_span=(0, SIMULATE_TIME),
-    y0=[initial_vertical_velocity, initial_altitude, initial_horizontal_velocity],
-    t_eval=simulation_time,
-    method="RK45"
-)
+def simulate(simulate_time=SIMULATE_TIME, points=SIMULATION_POINTS, parameters=None, rtol=1e-3, atol=1e-6):
+    """
+    Solve the system of equations of the rocket's motion.
+
+    :param parameters: Model parameters, see `parameter_vector`; nominal by default
+    """
+    from scipy import integrate
+
+    p = parameter_vector(parameters)
+    solution = integrate.solve_ivp(
+        system_equations,
+        t_span=(0, simulate_time),
+        y0=[INITIAL_VERTICAL_VELOCITY, INITIAL_ALTITUDE, INITIAL_HORIZONTAL_VELOCITY],
+        t_eval=np.linspace(0, simulate_time, points),
+        method="RK45",
+        args=(p,),
+        rtol=rtol,
+        atol=atol,
+    )
+
+    vertical_velocity = solution.y[0]
+    horizontal_velocity = solution.y[2]
+    return {
+        "time": solution.t,
+        "vertical_velocity": vertical_velocity,
+        "horizontal_velocity": horizontal_velocity,
+        "speed": np.sqrt(vertical_velocity ** 2 + horizontal_velocity ** 2),
+        "altitude": solution.y[1],
+        "mass": np.array([mass_at_time(t, p) for t in solution.t]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate the ascent and save the results for comparison.")
+    parser.add_argument("--time", type=float, default=SIMULATE_TIME, help="Simulated time (s)")
+    parser.add_argument("--output", default="records/model_data.json", help="Output JSON file")
+    parser.add_argument("--flight", help="KSP recording to compare with in the catalog (default: by file name)")
+    args = parser.parse_args()
+
+    write_values(simulate(args.time), args.output, args.flight)
 
-# Extract results
-time = solution.t
-vertical_velocity = solution.y[0]
-horizontal_velocity = solution.y[2]
-total_speed = np.sqrt(vertical_velocity ** 2 + horizontal_velocity ** 2)
-altitude = solution.y[1]
 
-# Save results to a file
-write_values()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+import argparse
+import json
+import os
+import sqlite3
+import time
+
+CATALOG_NAME = "catalog.sqlite"
+
+# File name prefixes of the two kinds of recordings; files with the same suffix form a pair
+RECORDING_PREFIXES = {
+    "flight": "flight_data",  # Telemetry recorded in Kerbal Space Program
+    "model": "model_data",  # Output of the mathematical model
+}
+
+# Relative mass drop between two samples treated as a staging event
+STAGING_MASS_DROP = 0.02
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    kind TEXT NOT NULL,
+    label TEXT,
+    registered_at REAL NOT NULL,
+    samples INTEGER NOT NULL,
+    duration REAL,
+    max_altitude REAL,
+    max_speed REAL,
+    initial_mass REAL,
+    final_mass REAL,
+    first_staging_time REAL
+);
+CREATE TABLE IF NOT EXISTS staging_events (
+    recording_id INTEGER NOT NULL REFERENCES recordings(id) ON DELETE CASCADE,
+    time REAL NOT NULL,
+    mass_drop REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS comparisons (
+    flight_id INTEGER NOT NULL REFERENCES recordings(id) ON DELETE CASCADE,
+    model_id INTEGER NOT NULL REFERENCES recordings(id) ON DELETE CASCADE,
+    speed_error REAL,
+    altitude_error REAL,
+    angle_error REAL,
+    mass_error REAL,
+    max_error REAL,
+    PRIMARY KEY (flight_id, model_id)
+);
+CREATE INDEX IF NOT EXISTS recordings_kind ON recordings(kind, first_staging_time);
+CREATE INDEX IF NOT EXISTS comparisons_error ON comparisons(max_error);
+"""
+
+
+def connect(records_dir="records"):
+    """
+    Open (and create if needed) the catalog of a records directory, records/catalog.sqlite by default.
+    """
+    os.makedirs(records_dir, exist_ok=True)
+    connection = sqlite3.connect(os.path.join(records_dir, CATALOG_NAME))
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def staging_events(data):
+    """
+    Detect staging as sudden relative mass drops between consecutive samples.
+    """
+    events = []
+    mass, times = data["mass"], data["time"]
+    for i in range(1, len(mass)):
+        if mass[i - 1] > 0 and (mass[i - 1] - mass[i]) / mass[i - 1] >= STAGING_MASS_DROP:
+            events.append((times[i], mass[i - 1] - mass[i]))
+    return events
+
+
+def summarize(data):
+    """
+    Compute summary statistics of a recording.
+    """
+    times = data["time"]
+    events = staging_events(data)
+    return {
+        "samples": len(times),
+        "duration": times[-1] - times[0] if times else None,
+        "max_altitude": max(data["altitude"], default=None),
+        "max_speed": max(data["speed"], default=None),
+        "initial_mass": data["mass"][0] if data["mass"] else None,
+        "final_mass": data["mass"][-1] if data["mass"] else None,
+        "first_staging_time": events[0][0] if events else None,
+        "staging_events": events,
+    }
+
+
+def peak_errors(flight_data, model_data):
+    """
+    Relative error (%) of every parameter at the point of its maximum absolute deviation.
+
+    KSP telemetry is interpolated onto the time grid of the model, as in visualize_results.py.
+    """
+    import numpy as np
+
+    errors = {}
+    for parameter in ("speed", "altitude", "angle", "mass"):
+        model = np.asarray(model_data[parameter], dtype=float)
+        interpolated = np.interp(model_data["time"], flight_data["time"], flight_data[parameter])
+        deviation = np.abs(model - interpolated)
+        index = len(deviation) - 1 - int(np.argmax(deviation[::-1]))  # Last maximum, as in max_percent_error
+        errors[parameter] = float(deviation[index] / model[index] * 100) if model[index] != 0 else 0.0
+    return errors
+
+
+def _counterpart_path(path, kind):
+    """
+    Path of the recording of the other kind that forms a pair with `path`, or None
+    if the file name does not follow the `flight_data*.json` / `model_data*.json` convention.
+    """
+    directory, name = os.path.split(path)
+    prefix = RECORDING_PREFIXES[kind]
+    if not (name.startswith(prefix) and name.endswith(".json")):
+        return None
+    other = "model" if kind == "flight" else "flight"
+    return os.path.join(directory, RECORDING_PREFIXES[other] + name[len(prefix):])
+
+
+def _load(path):
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+def register_recording(path, kind, data=None, label=None, counterpart=None):
+    """
+    Add or refresh a recording in the catalog of its directory.
+
+    Called whenever a recording is written; if the recording of the other kind with the same
+    name suffix is already registered, the peak errors of the pair are stored as well. A refresh
+    keeps the pairs of the recording, including ones set up with an explicit `counterpart`, and
+    recomputes their errors.
+
+    :param path: Path of the JSON recording
+    :param kind: "flight" or "model"
+    :param data: Already loaded recording, read from `path` when omitted
+    :param label: Optional free-form tag, e.g. the vehicle variant
+    :param counterpart: Recording of the other kind to compare with, in the same directory;
+                        found by the file name convention when omitted
+    :return: Summary of the recording
+    """
+    if kind not in RECORDING_PREFIXES:
+        raise ValueError(f"Unknown recording kind {kind!r}, expected one of: {', '.join(RECORDING_PREFIXES)}")
+    records_dir, name = os.path.split(path)
+    if counterpart is not None and os.path.dirname(counterpart) != records_dir:
+        raise ValueError(f"Counterpart {counterpart} must be in the same directory as {path}")
+    if data is None:
+        data = _load(path)
+
+    summary = summarize(data)
+    connection = connect(records_dir or ".")
+    try:
+        with connection:
+            # Update in place: the id, and with it the comparisons of the recording, survive a refresh
+            connection.execute(
+                "INSERT INTO recordings (path, kind, label, registered_at, samples, duration, max_altitude,"
+                " max_speed, initial_mass, final_mass, first_staging_time) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(path) DO UPDATE SET kind = excluded.kind, label = excluded.label,"
+                " registered_at = excluded.registered_at, samples = excluded.samples, duration = excluded.duration,"
+                " max_altitude = excluded.max_altitude, max_speed = excluded.max_speed,"
+                " initial_mass = excluded.initial_mass, final_mass = excluded.final_mass,"
+                " first_staging_time = excluded.first_staging_time",
+                (name, kind, label, time.time(), summary["samples"], summary["duration"], summary["max_altitude"],
+                 summary["max_speed"], summary["initial_mass"], summary["final_mass"], summary["first_staging_time"]),
+            )
+            recording_id = connection.execute("SELECT id FROM recordings WHERE path = ?", (name,)).fetchone()["id"]
+            connection.execute("DELETE FROM staging_events WHERE recording_id = ?", (recording_id,))
+            connection.executemany(
+                "INSERT INTO staging_events (recording_id, time, mass_drop) VALUES (?, ?, ?)",
+                [(recording_id, t, drop) for t, drop in summary["staging_events"]],
+            )
+
+            # Recompute the comparisons with every earlier partner and the counterpart of this call
+            own_column, other_column = ("flight_id", "model_id") if kind == "flight" else ("model_id", "flight_id")
+            partners = [
+                os.path.join(records_dir, row["path"])
+                for row in connection.execute(
+                    f"SELECT recordings.path FROM comparisons JOIN recordings"
+                    f" ON recordings.id = comparisons.{other_column} WHERE comparisons.{own_column} = ?",
+                    (recording_id,),
+                )
+            ]
+            connection.execute(f"DELETE FROM comparisons WHERE {own_column} = ?", (recording_id,))
+            other_path = counterpart or _counterpart_path(path, kind)
+            if other_path is not None and other_path not in partners:
+                partners.append(other_path)
+
+            for other_path in partners:
+                if not os.path.exists(other_path):
+                    continue
+                other = connection.execute(
+                    "SELECT id FROM recordings WHERE path = ?", (os.path.basename(other_path),)
+                ).fetchone()
+                if other is None:
+                    continue
+                flight_data, model_data = (data, _load(other_path)) if kind == "flight" else (_load(other_path), data)
+                flight_id, model_id = (recording_id, other["id"]) if kind == "flight" else (other["id"], recording_id)
+                errors = peak_errors(flight_data, model_data)
+                connection.execute(
+                    "INSERT INTO comparisons (flight_id, model_id, speed_error, altitude_error, angle_error,"
+                    " mass_error, max_error) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (flight_id, model_id, errors["speed"], errors["altitude"], errors["angle"], errors["mass"],
+                     max(errors.values())),
+                )
+    finally:
+        connection.close()
+    return summary
+
+
+def reindex(records_dir="records"):
+    """
+    Register every recording found in a records directory.
+    """
+    registered = []
+    for kind in ("flight", "model"):  # Models last so that every pair gets compared
+        prefix = RECORDING_PREFIXES[kind]
+        for name in sorted(os.listdir(records_dir)):
+            if name.startswith(prefix) and name.endswith(".json"):
+                register_recording(os.path.join(records_dir, name), kind)
+                registered.append(name)
+    return registered
+
+
+def find_recordings(records_dir="records", kind=None, label=None, staged_before=None, min_altitude=None):
+    """
+    Query recordings by metadata; returns rows with paths relative to the current directory.
+    """
+    clauses, parameters = [], []
+    if kind is not None:
+        clauses.append("kind = ?")
+        parameters.append(kind)
+    if label is not None:
+        clauses.append("label = ?")
+        parameters.append(label)
+    if staged_before is not None:
+        clauses.append("first_staging_time < ?")
+        parameters.append(staged_before)
+    if min_altitude is not None:
+        clauses.append("max_altitude >= ?")
+        parameters.append(min_altitude)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    connection = connect(records_dir)
+    rows = connection.execute(f"SELECT * FROM recordings{where} ORDER BY path", parameters).fetchall()
+    connection.close()
+    return [dict(row, path=os.path.join(records_dir, row["path"])) for row in rows]
+
+
+def find_comparisons(records_dir="records", staged_before=None, max_error_below=None):
+    """
+    Query flight/model pairs, e.g. all flights staged before 100 s with every error under 5%.
+    """
+    clauses, parameters = [], []
+    if staged_before is not None:
+        clauses.append("flight.first_staging_time < ?")
+        parameters.append(staged_before)
+    if max_error_below is not None:
+        clauses.append("comparisons.max_error < ?")
+        parameters.append(max_error_below)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    connection = connect(records_dir)
+    rows = connection.execute(
+        "SELECT flight.path AS flight_path, model.path AS model_path, flight.label AS label,"
+        " flight.first_staging_time AS first_staging_time, comparisons.* FROM comparisons"
+        " JOIN recordings AS flight ON flight.id = comparisons.flight_id"
+        " JOIN recordings AS model ON model.id = comparisons.model_id"
+        f"{where} ORDER BY comparisons.max_error",
+        parameters,
+    ).fetchall()
+    connection.close()
+    return [
+        dict(
+            row,
+            flight_path=os.path.join(records_dir, row["flight_path"]),
+            model_path=os.path.join(records_dir, row["model_path"]),
+        )
+        for row in rows
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the catalog of flight recordings.")
+    parser.add_argument("--records", default="records", help="Records directory (default: records)")
+    parser.add_argument("--reindex", action="store_true", help="Register all recordings of the directory first")
+    parser.add_argument("--staged-before", type=float, help="Only flights with first staging before T seconds")
+    parser.add_argument("--max-error", type=float, help="Only pairs with every peak error below P percent")
+    parser.add_argument("--plot", metavar="DIR", help="Render comparison plots of every matching pair into DIR")
+    args = parser.parse_args()
+
+    if args.reindex:
+        reindex(args.records)
+    for row in find_comparisons(args.records, args.staged_before, args.max_error):
+        staging = "-" if row["first_staging_time"] is None else f"{row['first_staging_time']:.2f} s"
+        print(
+            f"{row['flight_path']} vs {row['model_path']}: staging {staging}, "
+            f"V {row['speed_error']:.2f}%, H {row['altitude_error']:.2f}%, "
+            f"α {row['angle_error']:.2f}%, M {row['mass_error']:.2f}%"
+        )
+        if args.plot:
+            from visualize_results import compare, load_recordings, render
+
+            flight_name = os.path.splitext(os.path.basename(row["flight_path"]))[0]
+            model_name = os.path.splitext(os.path.basename(row["model_path"]))[0]
+            comparison = compare(*load_recordings(row["flight_path"], row["model_path"]))
+            render(comparison, os.path.join(args.plot, f"{flight_name}_vs_{model_name}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import numpy as np
+import argparse
+import math
+
+from generate_model_data import (
+    PARAMETER_NAMES,
+    SIMULATE_TIME,
+    SIMULATION_POINTS,
+    alpha,
+    drag_force,
+    gravity_at_altitude,
+    parameter_vector,
+    propulsion,
+)
+
+STATE_SIZE = 3  # Vertical velocity, altitude, horizontal velocity
+
+
+def augmented_equations(time, y, p):
+    """
+    Equations of motion extended with the forward variational equations dS/dt = J S + df/dp.
+
+    `y` holds the state followed by the row-major 3 x P sensitivity matrix S = d(state)/d(parameters).
+    """
+    vertical_velocity, altitude, horizontal_velocity = y[:STATE_SIZE].tolist()
+    sensitivities = y[STATE_SIZE:].reshape(STATE_SIZE, len(PARAMETER_NAMES))
+
+    thrust, mass, _, thrust_gradient, mass_gradient = propulsion(time, p, partials=True)
+    angle, angle_derivative = alpha(altitude, partials=True)
+    cos_angle, sin_angle = math.cos(angle), math.sin(angle)
+    vertical_drag, vertical_drag_dv, vertical_drag_dh, vertical_drag_dp = drag_force(
+        vertical_velocity, altitude, p, partials=True
+    )
+    horizontal_drag, horizontal_drag_du, horizontal_drag_dh, horizontal_drag_dp = drag_force(
+        horizontal_velocity, altitude, p, partials=True
+    )
+    gravity, gravity_derivative = gravity_at_altitude(altitude, partials=True)
+
+    vertical_force = thrust * cos_angle - vertical_drag
+    horizontal_force = thrust * sin_angle - horizontal_drag
+    derivatives = [vertical_force / mass - gravity, vertical_velocity, horizontal_force / mass]
+
+    # Jacobian of the right-hand side over the state
+    jacobian = np.array([
+        [
+            -vertical_drag_dv / mass,
+            (-thrust * sin_angle * angle_derivative - vertical_drag_dh) / mass - gravity_derivative,
+            0.0,
+        ],
+        [1.0, 0.0, 0.0],
+        [
+            0.0,
+            (thrust * cos_angle * angle_derivative - horizontal_drag_dh) / mass,
+            -horizontal_drag_du / mass,
+        ],
+    ])
+    # Explicit dependence of the right-hand side on the parameters
+    forcing = np.array([
+        (thrust_gradient * cos_angle - vertical_drag_dp) / mass - vertical_force * mass_gradient / mass ** 2,
+        np.zeros(len(PARAMETER_NAMES)),
+        (thrust_gradient * sin_angle - horizontal_drag_dp) / mass - horizontal_force * mass_gradient / mass ** 2,
+    ])
+
+    return np.concatenate([derivatives, (jacobian @ sensitivities + forcing).ravel()])
+
+
+def simulate_with_sensitivities(
+    parameters=None, simulate_time=SIMULATE_TIME, points=SIMULATION_POINTS, rtol=1e-8, atol=1e-8
+):
+    """
+    Integrate the ascent model together with its parameter Jacobian in a single solve_ivp run.
+
+    :param parameters: Model parameters, see `parameter_vector`; nominal by default
+    :return: Dictionary with the time grid, altitude, speed and mass, and for each of them
+             an (N, P) array of derivatives over the parameters in PARAMETER_NAMES order
+    """
+    from scipy import integrate
+
+    p = parameter_vector(parameters)
+
+    solution = integrate.solve_ivp(
+        augmented_equations,
+        t_span=(0, simulate_time),
+        y0=np.zeros(STATE_SIZE * (1 + len(PARAMETER_NAMES))),
+        t_eval=np.linspace(0, simulate_time, points),
+        method="RK45",
+        args=(p,),
+        rtol=rtol,
+        atol=atol,
+    )
+
+    vertical_velocity, altitude, horizontal_velocity = solution.y[:STATE_SIZE]
+    sensitivities = solution.y[STATE_SIZE:].reshape(STATE_SIZE, len(PARAMETER_NAMES), -1)
+    speed = np.sqrt(vertical_velocity ** 2 + horizontal_velocity ** 2)
+    safe_speed = np.where(speed > 0, speed, 1.0)[:, np.newaxis]
+    speed_sensitivity = (
+        vertical_velocity[:, np.newaxis] * sensitivities[0].T +
+        horizontal_velocity[:, np.newaxis] * sensitivities[2].T
+    ) / safe_speed
+    propulsion_values = [propulsion(t, p, partials=True) for t in solution.t]
+
+    return {
+        "time": solution.t,
+        "altitude": altitude,
+        "speed": speed,
+        "mass": np.array([values[1] for values in propulsion_values]),
+        "altitude_sensitivity": sensitivities[1].T,
+        "speed_sensitivity": speed_sensitivity,
+        "mass_sensitivity": np.array([values[4] for values in propulsion_values]),
+    }
+
+
+def final_sensitivities(result):
+    """
+    Derivatives of the final altitude, speed and mass over every parameter, keyed by name.
+    """
+    return {
+        output: dict(zip(PARAMETER_NAMES, result[f"{output}_sensitivity"][-1].tolist()))
+        for output in ("altitude", "speed", "mass")
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sensitivities of the final ascent state to the model parameters.")
+    parser.add_argument("--time", type=float, default=SIMULATE_TIME, help="Simulated time (s)")
+    args = parser.parse_args()
+
+    result = simulate_with_sensitivities(simulate_time=args.time)
+    sensitivities = final_sensitivities(result)
+    print(f"{'parameter':<18}{'dH/dp':>16}{'dV/dp':>16}{'dM/dp':>16}")
+    for name in PARAMETER_NAMES:
+        print(
+            f"{name:<18}{sensitivities['altitude'][name]:>16.6g}"
+            f"{sensitivities['speed'][name]:>16.6g}{sensitivities['mass'][name]:>16.6g}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+import numpy as np
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import time
+
+from body_models import table_key
+import generate_model_data
+from generate_model_data import NOMINAL_PARAMETERS, PARAMETER_NAMES, SIMULATE_TIME, parameter_vector, simulate
+
+SURROGATE_PATH = "records/cache/surrogate.npz"  # Serialized emulator
+SURROGATE_POINTS = 141  # Number of points of the emulated time grid
+DOMAIN_SPREAD = 0.1  # Trained domain: nominal parameters +-10%
+OUTPUTS = ("altitude", "speed", "mass")
+PCA_TOLERANCE = 1e-10  # Fraction of the output variance the discarded components may carry
+QUERY_CHUNK = 20_000  # Queries evaluated at once, bounds the memory of batch predictions
+SURROGATE_FORMAT_VERSION = 1  # Bump to invalidate saved surrogates
+TRAINING_RTOL = 1e-6  # Relative tolerance of the training simulations
+TRAINING_ATOL = 1e-6  # Absolute tolerance of the training simulations
+
+# Fixed constants of the ascent model a saved surrogate depends on besides its parameters
+MODEL_CONSTANTS = (
+    "GRAVITY_KERBIN",
+    "SRB_COUNT",
+    "SRB_BURN_TIME",
+    "STAGE2_ENGINE_COUNT",
+    "REFERENCE_AREA",
+    "TURN_START_ALTITUDE",
+    "TURN_END_ALTITUDE",
+    "INITIAL_VERTICAL_VELOCITY",
+    "INITIAL_ALTITUDE",
+    "INITIAL_HORIZONTAL_VELOCITY",
+)
+
+
+def simulate_parameters(p, simulate_time=SIMULATE_TIME, points=SURROGATE_POINTS):
+    """
+    Solve the ascent model for one parameter vector; returns the stacked altitude, speed and mass.
+    """
+    result = simulate(simulate_time, points, parameters=p, rtol=TRAINING_RTOL, atol=TRAINING_ATOL)
+    return np.concatenate([result[output] for output in OUTPUTS])
+
+
+def model_key(times):
+    """
+    Digest of everything a trained surrogate depends on: the nominal parameters, the fixed model
+    constants, the Kerbin tables, the solver tolerances, the time grid and the format version.
+    """
+    constants = {name: getattr(generate_model_data, name) for name in MODEL_CONSTANTS}
+    key = json.dumps(
+        [PARAMETER_NAMES, NOMINAL_PARAMETERS, constants, table_key("Kerbin"), TRAINING_RTOL, TRAINING_ATOL,
+         np.asarray(times).tolist(), SURROGATE_FORMAT_VERSION],
+        sort_keys=True,
+    )
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def surrogate_times(simulate_time=SIMULATE_TIME, points=SURROGATE_POINTS):
+    """
+    Time grid of the emulated trajectories.
+    """
+    return np.linspace(0, simulate_time, points)
+
+
+def simulate_batch(samples, times, workers=1):
+    """
+    Run the ascent model for every row of an (N, P) array of parameters on a uniform grid `times` starting at 0.
+    """
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(workers) as executor:
+            return np.array(list(executor.map(
+                simulate_parameters, samples, itertools.repeat(times[-1]), itertools.repeat(len(times)), chunksize=16
+            )))
+    return np.array([simulate_parameters(p, times[-1], len(times)) for p in samples])
+
+
+def total_degree_indices(dimensions, degree):
+    """
+    Multi-indices of all polynomials of total degree up to `degree`.
+    """
+    return np.array(
+        [index for index in itertools.product(range(degree + 1), repeat=dimensions) if sum(index) <= degree]
+    )
+
+
+def legendre_features(x, multi_indices):
+    """
+    Evaluate the polynomial chaos basis (products of Legendre polynomials) at points of [-1, 1]^P.
+
+    :return: (M, N) array for M multi-indices and N points
+    """
+    degree = multi_indices.max()
+    legendre = [np.ones_like(x), x]
+    for n in range(1, degree):
+        legendre.append(((2 * n + 1) * x * legendre[n] - n * legendre[n - 1]) / (n + 1))
+    legendre = np.stack(legendre[:degree + 1])  # (degree + 1, N, P)
+
+    features = np.ones((len(multi_indices), x.shape[0]))
+    for dimension in range(x.shape[1]):
+        features *= legendre[multi_indices[:, dimension], :, dimension]
+    return features
+
+
+class Surrogate:
+    """
+    Polynomial chaos emulator of the ascent model on a PCA reduced basis of the trajectories.
+
+    Predictions inside the trained parameter box cost a few polynomial evaluations; parameter
+    vectors outside of it are passed to the real solver.
+    """
+
+    def __init__(self, lower, upper, times, mean, components, coefficients, multi_indices):
+        self.lower = lower
+        self.upper = upper
+        self.times = times
+        self.mean = mean
+        self.components = components  # (R, 3T) reduced basis
+        self.coefficients = coefficients  # (M, R) polynomial coefficients of every basis vector
+        self.multi_indices = multi_indices
+
+    @classmethod
+    def fit(cls, samples, trajectories, lower, upper, times, degree=3):
+        """
+        Fit the emulator to simulated trajectories of an (N, P) array of parameter samples.
+        """
+        mean = trajectories.mean(axis=0)
+        _, singular_values, basis = np.linalg.svd(trajectories - mean, full_matrices=False)
+        variance = np.cumsum(singular_values ** 2) / np.sum(singular_values ** 2)
+        rank = int(np.searchsorted(variance, 1 - PCA_TOLERANCE)) + 1
+        components = basis[:rank]
+        scores = (trajectories - mean) @ components.T
+
+        multi_indices = total_degree_indices(samples.shape[1], degree)
+        features = legendre_features(cls._normalize(samples, lower, upper), multi_indices)
+        coefficients = np.linalg.lstsq(features.T, scores, rcond=None)[0]
+        return cls(lower, upper, times, mean, components, coefficients, multi_indices)
+
+    @staticmethod
+    def _normalize(samples, lower, upper):
+        return 2 * (samples - lower) / (upper - lower) - 1
+
+    def _as_array(self, parameters):
+        if isinstance(parameters, dict):
+            return np.array([parameter_vector(parameters)])
+        return np.atleast_2d(np.asarray(parameters, dtype=float))
+
+    def in_domain(self, parameters):
+        """
+        Mask of the parameter vectors inside the trained domain.
+        """
+        samples = self._as_array(parameters)
+        return np.all((samples >= self.lower) & (samples <= self.upper), axis=1)
+
+    def predict(self, parameters):
+        """
+        Predict altitude, speed and mass on `self.times`.
+
+        :param parameters: Dictionary of overrides of `nominal_parameters()` or an (N, P) array
+        :return: Dictionary of (N, T) arrays, or (T,) arrays for a dictionary or a single vector
+        """
+        samples = self._as_array(parameters)
+        trajectories = np.empty((len(samples), self.mean.size))
+        inside = self.in_domain(samples)
+
+        inside_rows = np.flatnonzero(inside)
+        for start in range(0, len(inside_rows), QUERY_CHUNK):
+            rows = inside_rows[start:start + QUERY_CHUNK]
+            features = legendre_features(self._normalize(samples[rows], self.lower, self.upper), self.multi_indices)
+            trajectories[rows] = self.mean + (features.T @ self.coefficients) @ self.components
+        for row in np.flatnonzero(~inside):
+            trajectories[row] = simulate_parameters(samples[row], self.times[-1], len(self.times))
+
+        single = isinstance(parameters, dict) or np.ndim(parameters) == 1
+        result = {}
+        for i, output in enumerate(OUTPUTS):
+            values = trajectories[:, i * len(self.times):(i + 1) * len(self.times)]
+            result[output] = values[0] if single else values
+        return result
+
+    def save(self, path=SURROGATE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez(
+            path,
+            key=np.array(model_key(self.times)),
+            lower=self.lower,
+            upper=self.upper,
+            times=self.times,
+            mean=self.mean,
+            components=self.components,
+            coefficients=self.coefficients,
+            multi_indices=self.multi_indices,
+        )
+
+    @classmethod
+    def load(cls, path=SURROGATE_PATH, times=None):
+        """
+        Load a saved surrogate, rejecting one trained for another model, parameter set or time grid.
+
+        :param times: Expected time grid, `surrogate_times()` by default
+        """
+        expected = model_key(surrogate_times() if times is None else times)
+        with np.load(path) as data:
+            if "key" not in data or str(data["key"]) != expected:
+                raise ValueError(f"Surrogate {path} was trained for a different model or time grid, retrain it")
+            return cls(
+                data["lower"], data["upper"], data["times"], data["mean"],
+                data["components"], data["coefficients"], data["multi_indices"],
+            )
+
+
+def parameter_bounds(spread=DOMAIN_SPREAD):
+    """
+    Lower and upper bounds of the trained domain around the nominal parameters.
+    """
+    nominal = np.array(NOMINAL_PARAMETERS)
+    return nominal * (1 - spread), nominal * (1 + spread)
+
+
+def sample_parameters(count, lower, upper, seed=0):
+    """
+    Quasi-random (scrambled Sobol) parameter samples covering the domain.
+    """
+    from scipy.stats import qmc
+
+    unit = qmc.Sobol(len(lower), seed=seed).random(count)
+    return qmc.scale(unit, lower, upper)
+
+
+def relative_errors(predicted, reference):
+    """
+    Maximum and mean absolute errors of every output relative to its largest magnitude.
+    """
+    errors = {}
+    for output in OUTPUTS:
+        scale = np.abs(reference[output]).max(axis=-1, keepdims=True)
+        error = np.abs(predicted[output] - reference[output]) / scale
+        errors[output] = (float(error.max()), float(error.mean()))
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the surrogate of the ascent model and report its accuracy.")
+    parser.add_argument("--samples", type=int, default=512, help="Number of training simulations")
+    parser.add_argument("--validation", type=int, default=64, help="Number of held-out validation simulations")
+    parser.add_argument("--degree", type=int, default=3, help="Total degree of the polynomial chaos")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes for the simulations")
+    parser.add_argument("--output", default=SURROGATE_PATH, help="Where to save the surrogate")
+    args = parser.parse_args()
+
+    times = surrogate_times()
+    lower, upper = parameter_bounds()
+
+    samples = sample_parameters(args.samples, lower, upper)
+    start = time.perf_counter()
+    simulate_parameters(samples[0])
+    solver_time = time.perf_counter() - start
+    start = time.perf_counter()
+    trajectories = simulate_batch(samples, times, args.workers)
+    surrogate = Surrogate.fit(samples, trajectories, lower, upper, times, args.degree)
+    surrogate.save(args.output)
+    print(f"Trained on {args.samples} simulations in {time.perf_counter() - start:.1f} s: "
+          f"{len(surrogate.components)} basis vectors, {len(surrogate.multi_indices)} polynomials.")
+
+    rng = np.random.default_rng(1)
+    validation = rng.uniform(lower, upper, size=(args.validation, len(lower)))
+    reference = simulate_batch(validation, times, args.workers)
+    reference = {output: reference[:, i * len(times):(i + 1) * len(times)] for i, output in enumerate(OUTPUTS)}
+    for output, (maximum, mean) in relative_errors(surrogate.predict(validation), reference).items():
+        print(f"{output}: max error {maximum * 100:.4f}%, mean error {mean * 100:.4f}%")
+
+    queries = rng.uniform(lower, upper, size=(100_000, len(lower)))
+    start = time.perf_counter()
+    surrogate.predict(queries)
+    batch_time = (time.perf_counter() - start) / len(queries)
+    start = time.perf_counter()
+    for p in queries[:1000]:
+        surrogate.predict(p)
+    single_time = (time.perf_counter() - start) / 1000
+    print(f"Batch queries: {batch_time * 1e6:.2f} us per trajectory ({1 / batch_time:,.0f} per second); "
+          f"single query: {single_time * 1e6:.1f} us; solver: {solver_time * 1e6:,.0f} us.")
+
+
+if __name__ == "__main__":
+    main()
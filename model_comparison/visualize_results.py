@@ -1,52 +1,48 @@
 from math import inf
-import matplotlib.pyplot as plt
 import numpy as np
+import argparse
 import json
 import os
 
-# Load data from JSON files
-with open("records/flight_data.json", "r") as f:
-    ksp_data = json.load(f)  # Data from Kerbal Space Program
-with open("records/model_data.json", "r") as f:
-    model_data = json.load(f)  # Data from the mathematical model
-
-# Extract data from JSON
-speed_ksp = ksp_data["speed"]
-altitude_ksp = ksp_data["altitude"]
-angle_ksp = ksp_data["angle"]
-mass_ksp = ksp_data["mass"]
-time_ksp = ksp_data["time"]
-
-speed = model_data["speed"]
-altitude = model_data["altitude"]
-angle = model_data["angle"]
-mass = model_data["mass"]
-time = model_data["time"]
-
-# Interpolate KSP data onto the time grid of the mathematical model
-speed_ksp_interp = np.interp(time, time_ksp, speed_ksp)
-altitude_ksp_interp = np.interp(time, time_ksp, altitude_ksp)
-angle_ksp_interp = np.interp(time, time_ksp, angle_ksp)
-mass_ksp_interp = np.interp(time, time_ksp, mass_ksp)
-
-# Calculate absolute errors
-speed_error = [abs(s1 - s2) for s1, s2 in zip(speed, speed_ksp_interp)]
-altitude_error = [abs(a1 - a2) for a1, a2 in zip(altitude, altitude_ksp_interp)]
-angle_error = [abs(ang1 - ang2) for ang1, ang2 in zip(angle, angle_ksp_interp)]
-mass_error = [abs(m1 - m2) for m1, m2 in zip(mass, mass_ksp_interp)]
-
-# Function to calculate percentage errors
+from downsampling import downsample
+
+PARAMETERS = ("speed", "altitude", "angle", "mass")
+
+
+def load_recordings(flight_path="records/flight_data.json", model_path="records/model_data.json"):
+    """
+    Load data from JSON files: KSP telemetry and the output of the mathematical model.
+    """
+    with open(flight_path, "r") as f:
+        ksp_data = json.load(f)  # Data from Kerbal Space Program
+    with open(model_path, "r") as f:
+        model_data = json.load(f)  # Data from the mathematical model
+    return ksp_data, model_data
+
+
 def calculate_percent_error(model, interpolated):
     """
     Calculate percentage error between model and interpolated data.
     """
     return [(abs(m - i) / m * 100) if m != 0 else 0 for m, i in zip(model, interpolated)]
 
-# Calculate percentage errors
-speed_error_percent = calculate_percent_error(speed, speed_ksp_interp)
-altitude_error_percent = calculate_percent_error(altitude, altitude_ksp_interp)
-angle_error_percent = calculate_percent_error(angle, angle_ksp_interp)
-mass_error_percent = calculate_percent_error(mass, mass_ksp_interp)
+
+def compare(ksp_data, model_data):
+    """
+    Interpolate KSP data onto the time grid of the mathematical model and calculate the errors.
+    """
+    time = model_data["time"]
+    comparison = {"time": time, "time_ksp": ksp_data["time"]}
+    for parameter in PARAMETERS:
+        model = model_data[parameter]
+        interpolated = np.interp(time, ksp_data["time"], ksp_data[parameter])
+        comparison[parameter] = model
+        comparison[f"{parameter}_ksp"] = ksp_data[parameter]  # Full-rate recording, used for plotting
+        comparison[f"{parameter}_ksp_interp"] = interpolated  # On the model grid, used for the errors
+        comparison[f"{parameter}_error"] = [abs(m - i) for m, i in zip(model, interpolated)]
+        comparison[f"{parameter}_error_percent"] = calculate_percent_error(model, interpolated)
+    return comparison
+
 
 def max_percent_error(time, model, interpolated, graph_name):
     """
@@ -60,102 +56,132 @@ def max_percent_error(time, model, interpolated, graph_name):
             result = (t, abs(m - i) / m * 100 if m != 0 else 0)
     print(f"The maximum error for {graph_name} is {result[1]}% at time t={result[0]} s.")
 
-max_percent_error(time, speed, speed_ksp_interp, "V(t)")
-max_percent_error(time, altitude, altitude_ksp_interp, "H(t)")
-max_percent_error(time, angle, angle_ksp_interp, "α(t)")
-max_percent_error(time, mass, mass_ksp_interp, "M(t)")
 
-# Generate plots
-# Ensure output directory exists
-os.makedirs("output", exist_ok=True)
+def print_max_errors(comparison):
+    """
+    Print the maximum error of every parameter.
+    """
+    for parameter, graph_name in zip(PARAMETERS, ("V(t)", "H(t)", "α(t)", "M(t)")):
+        max_percent_error(
+            comparison["time"], comparison[parameter], comparison[f"{parameter}_ksp_interp"], graph_name
+        )
+
 
 # Plotting functions
-def plot_speed_time():
-    plt.title("Зависимость скорости от времени")
-    plt.plot(time, speed, label="Мат. модель")
-    plt.plot(time, speed_ksp_interp, label="Kerbal Space Program")
-    plt.plot(time, speed_error, label="Погрешность", linestyle="--", color="#7edb5c")
-    plt.legend()
-    plt.grid()
-    plt.xlabel("Время, с")
-    plt.ylabel("Скорость, м/с")
+def plot_series(x, y, method="lttb", **kwargs):
+    """
+    Plot a series reduced to a bounded number of points; metrics are computed on the full data.
+    """
+    import matplotlib.pyplot as plt
 
-def plot_altitude_time():
-    plt.title("Зависимость высоты от времени")
-    plt.plot(time, altitude, label="Мат. модель")
-    plt.plot(time, altitude_ksp_interp, label="Kerbal Space Program")
-    plt.plot(time, altitude_error, label="Погрешность", linestyle="--", color="#db5c9a")
-    plt.legend()
-    plt.grid()
-    plt.xlabel("Время, с")
-    plt.ylabel("Высота, м")
+    plt.plot(*downsample(x, y, method=method), **kwargs)
 
-def plot_angle_time():
-    plt.title("Зависимость угла наклона от времени")
-    plt.plot(time, angle, label="Мат. модель")
-    plt.plot(time, angle_ksp_interp, label="Kerbal Space Program")
-    plt.plot(time, angle_error, label="Погрешность", linestyle="--", color="#F5D033")
-    plt.legend()
-    plt.grid()
-    plt.xlabel("Время, с")
-    plt.ylabel("Угол, °")
 
-def plot_mass_time():
-    plt.title("Зависимость массы от времени")
-    plt.plot(time, mass, label="Мат. модель")
-    plt.plot(time, mass_ksp_interp, label="Kerbal Space Program")
-    plt.plot(time, mass_error, label="Погрешность", linestyle="--", color="#33f5f5")
+def plot_parameter_time(comparison, parameter, title, ylabel, color):
+    """
+    Plot a parameter of the model against KSP data together with the absolute error.
+    """
+    import matplotlib.pyplot as plt
+
+    time = comparison["time"]
+    plt.title(title)
+    plot_series(time, comparison[parameter], label="Мат. модель")
+    plot_series(comparison["time_ksp"], comparison[f"{parameter}_ksp"], label="Kerbal Space Program")
+    plot_series(
+        time, comparison[f"{parameter}_error"], method="minmax", label="Погрешность", linestyle="--", color=color
+    )
     plt.legend()
     plt.grid()
     plt.xlabel("Время, с")
-    plt.ylabel("Масса, кг")
+    plt.ylabel(ylabel)
+
+
+def plot_speed_time(comparison):
+    plot_parameter_time(comparison, "speed", "Зависимость скорости от времени", "Скорость, м/с", "#7edb5c")
+
 
-def plot_relative_error():
+def plot_altitude_time(comparison):
+    plot_parameter_time(comparison, "altitude", "Зависимость высоты от времени", "Высота, м", "#db5c9a")
+
+
+def plot_angle_time(comparison):
+    plot_parameter_time(comparison, "angle", "Зависимость угла наклона от времени", "Угол, °", "#F5D033")
+
+
+def plot_mass_time(comparison):
+    plot_parameter_time(comparison, "mass", "Зависимость массы от времени", "Масса, кг", "#33f5f5")
+
+
+def plot_relative_error(comparison):
+    import matplotlib.pyplot as plt
+
+    time = comparison["time"]
     plt.title("Относительная погрешность")
     plt.ylim(top=150)
-    plt.plot(time, speed_error_percent, label="Скорость", color="#7edb5c")
-    plt.plot(time, altitude_error_percent, label="Высота", color="#db5c9a")
-    plt.plot(time, angle_error_percent, label="Угол", color="#F5D033")
-    plt.plot(time, mass_error_percent, label="Масса", color="#33f5f5")
+    plot_series(time, comparison["speed_error_percent"], method="minmax", label="Скорость", color="#7edb5c")
+    plot_series(time, comparison["altitude_error_percent"], method="minmax", label="Высота", color="#db5c9a")
+    plot_series(time, comparison["angle_error_percent"], method="minmax", label="Угол", color="#F5D033")
+    plot_series(time, comparison["mass_error_percent"], method="minmax", label="Масса", color="#33f5f5")
     plt.legend()
     plt.grid()
     plt.xlabel("Время, с")
     plt.ylabel("Погрешность, %")
 
-# Save individual plots
-plt.figure(figsize=(8, 6))
-plot_speed_time()
-plt.savefig("output/speed_time.png", dpi=300)
-plt.close()
-plt.figure(figsize=(8, 6))
-plot_altitude_time()
-plt.savefig("output/altitude_time.png", dpi=300)
-plt.close()
-plt.figure(figsize=(8, 6))
-plot_angle_time()
-plt.savefig("output/angle_time.png", dpi=300)
-plt.close()
-plt.figure(figsize=(8, 6))
-plot_mass_time()
-plt.savefig("output/mass_time.png", dpi=300)
-plt.close()
-plt.figure(figsize=(8, 6))
-plot_relative_error()
-plt.savefig("output/relative_error.png", dpi=300)
-plt.close()
-
-# Combined overview plot
-plt.figure(figsize=(16, 9))
-plt.subplot(2, 3, 1)
-plot_speed_time()
-plt.subplot(2, 3, 2)
-plot_altitude_time()
-plt.subplot(2, 3, 3)
-plot_angle_time()
-plt.subplot(2, 3, 4)
-plot_mass_time()
-plt.subplot(2, 3, 5)
-plot_relative_error()
-plt.tight_layout()
-plt.savefig("output/comparison_flight_parameters.png", dpi=300)
-plt.show()
+
+def render(comparison, output_dir="output", show=False):
+    """
+    Save individual plots and the combined overview plot to the output directory.
+    """
+    import matplotlib.pyplot as plt
+
+    # Ensure output directory exists
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Save individual plots
+    for plot, name in (
+        (plot_speed_time, "speed_time"),
+        (plot_altitude_time, "altitude_time"),
+        (plot_angle_time, "angle_time"),
+        (plot_mass_time, "mass_time"),
+        (plot_relative_error, "relative_error"),
+    ):
+        plt.figure(figsize=(8, 6))
+        plot(comparison)
+        plt.savefig(os.path.join(output_dir, f"{name}.png"), dpi=300)
+        plt.close()
+
+    # Combined overview plot
+    plt.figure(figsize=(16, 9))
+    plt.subplot(2, 3, 1)
+    plot_speed_time(comparison)
+    plt.subplot(2, 3, 2)
+    plot_altitude_time(comparison)
+    plt.subplot(2, 3, 3)
+    plot_angle_time(comparison)
+    plt.subplot(2, 3, 4)
+    plot_mass_time(comparison)
+    plt.subplot(2, 3, 5)
+    plot_relative_error(comparison)
+    plt.tight_layout()
+    plt.savefig(os.path.join(output_dir, "comparison_flight_parameters.png"), dpi=300)
+    if show:
+        plt.show()
+    else:
+        plt.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the mathematical model with KSP flight data.")
+    parser.add_argument("--flight", default="records/flight_data.json", help="KSP flight recording")
+    parser.add_argument("--model", default="records/model_data.json", help="Model output")
+    parser.add_argument("--output", default="output", help="Directory for the plots")
+    parser.add_argument("--no-show", action="store_true", help="Do not open the overview plot window")
+    args = parser.parse_args()
+
+    comparison = compare(*load_recordings(args.flight, args.model))
+    print_max_errors(comparison)
+    render(comparison, args.output, show=not args.no_show)
+
+
+if __name__ == "__main__":
+    main()